@@ -1,22 +1,41 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse
+from sse_starlette.sse import EventSourceResponse
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-import shutil
+import functools
 import tempfile
+import time
 import asyncio
-import json
-import subprocess
-import re
+import os
+import signal
+
+import aiofiles
+import orjson
+
+try:  # Linux only; other platforms poll the scorefiles instead
+    from asyncinotify import Inotify, Mask
+except ImportError:
+    Inotify = None
 
 from pipeline import (
-    fetch_pdb, copy_uploaded_pdb, write_fasta, run_colabfold,
+    fetch_pdb, close_http_client, copy_uploaded_pdb, write_fasta, run_colabfold,
     run_clean_pdb, normalize_chains, sanitize_pdb,
     combine_in_python, run_docking, parse_fasc_and_find_best,
-    parse_fasc_all_models, visualize_best_model
+    parse_fasc_all_models, visualize_best_model, write_docking_shards,
+    merge_sharded_fasc, merged_model_desc, remove_shard_outputs
 )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
 # --------------------------
 # CORS (Vite frontend)
@@ -29,6 +48,7 @@ app.add_middleware(
 )
 
 WORKDIR = Path("/home/gowrishr74/app_test")  # CHANGE IF NEEDED
+WORKDIR_RESOLVED = WORKDIR.resolve()
 
 
 def get_project_dir(project: str) -> Path:
@@ -45,7 +65,7 @@ async def api_fetch(project: str = Form(...), role: str = Form(...), pdbCode: st
     outdir = project_dir / role
     outdir.mkdir(parents=True, exist_ok=True)
     
-    path = fetch_pdb(pdbCode, outdir)
+    path = await fetch_pdb(pdbCode, outdir)
     return { "path": str(path), "filePath": str(path), "project": project }
 
 
@@ -56,8 +76,10 @@ async def api_upload(project: str = Form(...), role: str = Form(...), file: Uplo
     outdir.mkdir(parents=True, exist_ok=True)
 
     out = outdir / file.filename
-    with out.open("wb") as f:
-        f.write(await file.read())
+    # Copy in 1 MiB chunks so large ensembles never sit fully in memory
+    async with aiofiles.open(out, "wb") as f:
+        while chunk := await file.read(1 << 20):
+            await f.write(chunk)
 
     return {"path": str(out), "filePath": str(out), "project": project}
 
@@ -68,7 +90,7 @@ async def api_predict(project: str = Form(...), role: str = Form(...), sequence:
     outdir = project_dir / f"{role}_colabfold"
     with tempfile.TemporaryDirectory() as tmp:
         fasta = write_fasta(sequence.strip(), Path(tmp), role)
-        pdb = run_colabfold(fasta, outdir)
+        pdb = await asyncio.to_thread(run_colabfold, fasta, outdir)
     return { "path": str(pdb), "filePath": str(pdb), "project": project }
 
 
@@ -78,30 +100,37 @@ async def api_clean(project: str = Form(...), rec: str = Form(...), bin: str = F
     project_dir = get_project_dir(project)
     rec_out = project_dir / "receptor_clean.pdb"
     bin_out = project_dir / "binder_clean.pdb"
-    run_clean_pdb(Path(rec), rec_out)
-    run_clean_pdb(Path(bin), bin_out)
+    # Receptor and binder are independent, so clean them concurrently
+    await asyncio.gather(
+        asyncio.to_thread(run_clean_pdb, Path(rec), rec_out),
+        asyncio.to_thread(run_clean_pdb, Path(bin), bin_out),
+    )
     return { "rec": str(rec_out), "bin": str(bin_out), "project": project }
 
 @app.post("/normalize")
 async def api_normalize(project: str = Form(...), rec: str = Form(...), bin: str = Form(...)):
     project_dir = get_project_dir(project)
+    # Sequential on purpose: the binder's chain IDs depend on those the receptor used.
+    # Both calls still run in a worker thread so the event loop stays free.
     used = set()
-    rec2, used = normalize_chains(Path(rec), used)
-    bin2, used = normalize_chains(Path(bin), used)
+    rec2, used = await asyncio.to_thread(normalize_chains, Path(rec), used)
+    bin2, used = await asyncio.to_thread(normalize_chains, Path(bin), used)
     return { "rec": str(rec2), "bin": str(bin2), "project": project }
 
 @app.post("/sanitize")
 async def api_sanitize(project: str = Form(...), rec: str = Form(...), bin: str = Form(...)):
     project_dir = get_project_dir(project)
-    rec2 = sanitize_pdb(Path(rec))
-    bin2 = sanitize_pdb(Path(bin))
+    rec2, bin2 = await asyncio.gather(
+        asyncio.to_thread(sanitize_pdb, Path(rec)),
+        asyncio.to_thread(sanitize_pdb, Path(bin)),
+    )
     return { "rec": str(rec2), "bin": str(bin2), "project": project }
 
 @app.post("/merge")
 async def api_merge(project: str = Form(...), rec: str = Form(...), bin: str = Form(...)):
     project_dir = get_project_dir(project)
     out = project_dir / "complex_input.pdb"
-    combine_in_python(Path(rec), Path(bin), out)
+    await asyncio.to_thread(combine_in_python, Path(rec), Path(bin), out)
     return { "out": str(out), "path": str(out), "output": str(out), "project": project }
 
 
@@ -120,11 +149,13 @@ async def api_dock(project: str = Form(...), nstruct: int = Form(10)):
             "Please run the merge step first."
         )
     
-    # Actually run Rosetta docking
-    docking_result = run_docking(
+    # Actually run Rosetta docking (in a worker thread so the event loop stays free)
+    docking_result = await asyncio.to_thread(
+        run_docking,
         complex_pdb=complex_pdb,
         output_dir=project_dir,
         nstruct=nstruct,
+        workers=DOCKING_WORKERS,
     )
     
     # Parse results to find best model
@@ -150,8 +181,84 @@ async def api_dock(project: str = Form(...), nstruct: int = Form(10)):
 # ---------------- DOCKING WITH STREAMING ----------------
 ROSETTA_BIN = "/home/gowrishr74/Documents/rosetta.source.release-371/main/source/bin/rosetta_scripts.linuxgccrelease"
 
-# Store active docking processes for cancellation
-active_docking_jobs: dict[str, subprocess.Popen] = {}
+# Number of Rosetta processes a streamed docking run is split across
+DOCKING_WORKERS = int(os.environ.get("PROTEINWEB_DOCKING_WORKERS", os.cpu_count() or 1))
+
+# How often scorefiles are re-checked when inotify is unavailable (seconds)
+FASC_POLL_INTERVAL = 2.0
+
+def _sse(obj) -> bytes:
+    """
+    Encode an SSE data frame with orjson. EventSourceResponse passes bytes
+    through as-is, skipping the str round trip and its line splitting.
+    """
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+
+# Progress and score updates are coalesced into one "batch" event per window
+BATCH_INTERVAL = 0.1  # seconds
+BATCH_MAX_SCORES = 50
+
+# Seconds a cancelled Rosetta process group gets to exit before SIGKILL
+CANCEL_GRACE_PERIOD = 5.0
+
+
+@dataclass
+class DockingJob:
+    """A running /dock-stream job: its Rosetta processes and a cancel flag."""
+    processes: list[asyncio.subprocess.Process] = field(default_factory=list)
+    cancel_event: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+# Store active docking jobs for cancellation
+active_docking_jobs: dict[str, DockingJob] = {}
+
+
+def signal_process_group(process: asyncio.subprocess.Process, sig: int) -> None:
+    """Send sig to the process group a Rosetta process leads, if it is still running."""
+    if process.returncode is None:
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+async def kill_after_grace_period(processes: list[asyncio.subprocess.Process]) -> None:
+    """SIGKILL any process group that ignored SIGTERM for CANCEL_GRACE_PERIOD."""
+    await asyncio.sleep(CANCEL_GRACE_PERIOD)
+    for process in processes:
+        signal_process_group(process, signal.SIGKILL)
+
+
+# Background tasks stopping abandoned runs (kept referenced until they finish)
+stopping_docking_runs: set[asyncio.Task] = set()
+
+
+async def stop_docking_run(
+    processes: list[asyncio.subprocess.Process], shard_fascs: list[Path], fasc_path: Path
+) -> None:
+    """
+    Stop a streamed docking run that ended early: SIGTERM its process groups,
+    SIGKILL any still running after CANCEL_GRACE_PERIOD, then merge the models
+    the shards finished into fasc_path and delete the remaining shard files.
+    """
+    for process in processes:
+        signal_process_group(process, signal.SIGTERM)
+    exits = asyncio.gather(*(process.wait() for process in processes))
+    try:
+        await asyncio.wait_for(asyncio.shield(exits), CANCEL_GRACE_PERIOD)
+    except asyncio.TimeoutError:
+        for process in processes:
+            signal_process_group(process, signal.SIGKILL)
+        await exits
+
+    if shard_fascs:
+        def fold_shards() -> None:
+            merge_sharded_fasc(shard_fascs, fasc_path)
+            remove_shard_outputs(fasc_path.parent)
+
+        await asyncio.to_thread(fold_shards)
+
 
 @app.post("/dock-stream")
 async def api_dock_stream(project: str = Form(...), nstruct: int = Form(10)):
@@ -166,149 +273,247 @@ async def api_dock_stream(project: str = Form(...), nstruct: int = Form(10)):
     
     async def generate_progress():
         # Setup docking files
-        xml_path = project_dir / "docking_full.xml"
-        options_path = project_dir / "docking.options.txt"
         log_path = project_dir / "docking_full.log"
+        fasc_path = project_dir / "docking.fasc"
         
-        # Copy the WORKING XML protocol (full docking pipeline)
-        DOCKING_XML_SRC = Path("/home/gowrishr74/docking_new/docking_full.xml")
-        DOCKING_OPTIONS_SRC = Path("/home/gowrishr74/docking_new/docking.options.txt")
-        
-        shutil.copy(DOCKING_XML_SRC, xml_path)
-        
-        # Copy and update options file with correct paths
-        opt_text = DOCKING_OPTIONS_SRC.read_text().splitlines()
-        new_lines = []
-        for line in opt_text:
-            if line.strip().startswith("-s "):
-                new_lines.append(f"-s {complex_pdb}")
-            elif line.strip().startswith("-out:file:scorefile"):
-                new_lines.append(f"-out:file:scorefile {project_dir / 'docking.fasc'}")
-            else:
-                new_lines.append(line)
-        # Add nstruct override
-        new_lines.append(f"-nstruct {nstruct}")
-        options_path.write_text("\n".join(new_lines))
+        # Send the start event before any disk I/O so the client sees the stream open at once
+        yield _sse({'type': 'start', 'total': nstruct, 'message': 'Starting Rosetta docking...'})
         
-        cmd = [
-            ROSETTA_BIN,
-            f"@{options_path}",
-            "-parser:protocol", str(xml_path),
-            "-out:suffix", "_full",
-            "-overwrite"
-        ]
-        
-        # Send start event
-        yield f"data: {json.dumps({'type': 'start', 'total': nstruct, 'message': 'Starting Rosetta docking...'})}\n\n"
-        
-        # Start process
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            cwd=str(project_dir)
-        )
-        
-        # Store for potential cancellation
-        active_docking_jobs[project] = process
+        try:
+            # Fresh docking.fasc, the XML protocol and one options file per Rosetta
+            # process (nstruct split across up to DOCKING_WORKERS of them)
+            shards = await asyncio.to_thread(
+                write_docking_shards, complex_pdb, project_dir, nstruct, DOCKING_WORKERS, ROSETTA_BIN
+            )
+        except Exception as e:
+            yield _sse({'type': 'error', 'message': f'Failed to prepare docking files: {str(e)}'})
+            return
+        n_shards = len(shards)
+        sharded = n_shards > 1
         
         structures_done = 0
-        scores = []
+
+        # Scorefiles are tailed from a byte offset so each check only reads what
+        # Rosetta appended since the previous one. They were removed above, so
+        # every row belongs to this run.
+        fasc_tails = {shard_fasc: [0, b""] for _, shard_fasc in shards}
+
+        def read_new_scores() -> list[dict]:
+            """Return the SCORE rows appended to the scorefiles since the last call."""
+            new_scores = []
+            for path, tail in fasc_tails.items():
+                offset, buf = tail
+                try:
+                    # Only a scorefile that has grown is worth opening
+                    if os.stat(path).st_size <= offset:
+                        continue
+                    with open(path, "rb") as f:
+                        f.seek(offset)
+                        chunk = f.read()
+                        offset = f.tell()
+                except FileNotFoundError:
+                    continue
+
+                if chunk:
+                    *rows, buf = (buf + chunk).split(b"\n")
+                    for row in rows:
+                        if not row.startswith(b"SCORE:"):
+                            continue
+                        # Only the first value and the description are needed, so
+                        # don't tokenise every column. The header row's first field
+                        # is a column name and never parses as a float.
+                        fields = row[6:].split(None, 1)
+                        try:
+                            score = float(fields[0])
+                        except (IndexError, ValueError):
+                            continue
+                        line = row.decode().strip()
+                        desc = line.rsplit(None, 1)[-1] if len(fields) > 1 else "unknown"
+                        if sharded and len(fields) > 1:
+                            # Report the name the model gets once the shards are merged,
+                            # so live scores match the final allModels
+                            merged_desc = merged_model_desc(desc, n_shards)
+                            line = line[: -len(desc)] + merged_desc
+                            desc = merged_desc
+                        new_scores.append({'score': score, 'desc': desc, 'line': line})
+                tail[:] = [offset, buf]
+            return new_scores
         
+        # Wake the stream loop when a scorefile changes instead of polling it
+        fasc_tick = object()
+
+        async def watch_fasc(queue: asyncio.Queue) -> None:
+            if Inotify is not None:
+                try:
+                    with Inotify() as inotify:
+                        inotify.add_watch(project_dir, Mask.MODIFY | Mask.CLOSE_WRITE)
+                        async for event in inotify:
+                            if event.path in fasc_tails:
+                                await queue.put(fasc_tick)
+                except OSError:
+                    pass  # e.g. fs.inotify.max_user_instances reached: poll instead
+            while True:
+                await asyncio.sleep(FASC_POLL_INTERVAL)
+                await queue.put(fasc_tick)
+
+        # Store for potential cancellation
+        job = DockingJob()
+        active_docking_jobs[project] = job
+
+        tasks: list[asyncio.Task] = []
+        run_finished = False
         try:
-            # Stream output line by line
-            with open(log_path, "w") as log_file:
-                for line in iter(process.stdout.readline, ''):
-                    if not line:
+            # Rosetta writes its output straight to the log; progress and scores come
+            # from the scorefiles, so no stdout passes through Python. Each process gets
+            # its own process group so cancelling also reaches anything Rosetta spawns.
+            with open(log_path, "wb") as log_file:
+                for cmd, _ in shards:
+                    job.processes.append(await asyncio.create_subprocess_exec(
+                        *cmd,
+                        stdout=log_file,
+                        stderr=asyncio.subprocess.STDOUT,
+                        cwd=str(project_dir),
+                        start_new_session=True
+                    ))
+
+            if nstruct == 1:
+                # A single model has no intermediate progress to report
+                await job.processes[0].wait()
+                if job.cancel_event.is_set():
+                    return
+
+                structures_done = len(read_new_scores())
+                yield _sse({'type': 'progress', 'current': structures_done, 'total': nstruct, 'percent': 100})
+            else:
+                # None marks a finished process and fasc_tick a scorefile change
+                events: asyncio.Queue = asyncio.Queue()
+
+                async def report_exit(process: asyncio.subprocess.Process) -> None:
+                    await process.wait()
+                    await events.put(None)
+
+                async def wake_on_cancel() -> None:
+                    await job.cancel_event.wait()
+                    await events.put(fasc_tick)
+
+                tasks = [asyncio.create_task(report_exit(process)) for process in job.processes]
+                running = len(tasks)
+                tasks.append(asyncio.create_task(watch_fasc(events)))
+                tasks.append(asyncio.create_task(wake_on_cancel()))
+
+                # Updates wait here until the batch window elapses
+                pending_progress = None
+                pending_scores = []
+                last_emit = time.monotonic()
+
+                def take_batch() -> bytes:
+                    nonlocal pending_progress, pending_scores, last_emit
+                    batch = {'type': 'batch', 'progress': pending_progress, 'scores': pending_scores}
+                    pending_progress = None
+                    pending_scores = []
+                    last_emit = time.monotonic()
+                    return _sse(batch)
+
+                while running:
+                    # With updates pending, wake up when their batch window closes
+                    timeout = None
+                    if pending_progress or pending_scores:
+                        timeout = max(0.0, BATCH_INTERVAL - (time.monotonic() - last_emit))
+                    try:
+                        event = await asyncio.wait_for(events.get(), timeout)
+                    except asyncio.TimeoutError:
+                        event = fasc_tick
+                    if job.cancel_event.is_set():
                         break
-                        
-                    log_file.write(line)
-                    log_file.flush()
-                    
-                    # Parse progress - Rosetta prints structure completion
-                    # Look for "protocols.jd2.JobDistributor" lines
-                    if "protocols.jd2.JobDistributor" in line:
-                        match = re.search(r"starting\s+(\d+)", line, re.IGNORECASE)
-                        if match:
-                            current = int(match.group(1))
-                            percent = int((current / nstruct) * 100)
-                            yield f"data: {json.dumps({'type': 'progress', 'current': current, 'total': nstruct, 'percent': percent})}\n\n"
-                    
-                    # Parse completion messages
-                    if "job" in line.lower() and "completed" in line.lower():
-                        structures_done += 1
+                    # Drain whatever queued up meanwhile, so a burst of inotify
+                    # events or exits costs a single scorefile read
+                    drained = [event]
+                    while not events.empty():
+                        drained.append(events.get_nowait())
+                    running -= drained.count(None)
+
+                    new_scores = read_new_scores()
+                    if new_scores:
+                        structures_done += len(new_scores)
                         percent = int((structures_done / nstruct) * 100)
-                        yield f"data: {json.dumps({'type': 'progress', 'current': structures_done, 'total': nstruct, 'percent': percent})}\n\n"
-                    
-                    # Check for SCORE lines (real scores, not headers)
-                    if line.startswith("SCORE:") and "total_score" not in line and "description" not in line:
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            try:
-                                score = float(parts[1])
-                                desc = parts[-1] if len(parts) > 2 else "unknown"
-                                scores.append({"score": score, "desc": desc})
-                                yield f"data: {json.dumps({'type': 'score', 'score': score, 'desc': desc, 'line': line.strip()})}\n\n"
-                            except ValueError:
-                                pass
-                    
-                    # Allow other async tasks
-                    await asyncio.sleep(0)
-            
-            process.wait()
+                        pending_progress = {'current': structures_done, 'total': nstruct, 'percent': percent}
+                        pending_scores.extend(new_scores)
+
+                    if (pending_progress or pending_scores) and (
+                        time.monotonic() - last_emit >= BATCH_INTERVAL
+                        or len(pending_scores) >= BATCH_MAX_SCORES
+                    ):
+                        yield take_batch()
+
+                if job.cancel_event.is_set():
+                    return
+                if pending_progress or pending_scores:
+                    yield take_batch()
+
+                if sharded:
+                    # Every process has exited, so the run is over even if the client
+                    # leaves during the merge (the thread still finishes it)
+                    run_finished = True
+                    # One rename per model PDB plus the fasc rewrite: keep it off the event loop
+                    await asyncio.to_thread(
+                        merge_sharded_fasc, [shard_fasc for _, shard_fasc in shards], fasc_path
+                    )
+            run_finished = True
             
             # Remove from active jobs
-            if project in active_docking_jobs:
+            if active_docking_jobs.get(project) is job:
                 del active_docking_jobs[project]
+            dock_results_cache.pop(project, None)
             
             # Parse final results
-            fasc_path = project_dir / "docking.fasc"
             if fasc_path.exists():
                 try:
-                    best = parse_fasc_and_find_best(
-                        fasc_path=fasc_path,
-                        pdb_glob=str(project_dir / "complex_input_full_*.pdb")
-                    )
+                    # Parse the scorefile once and pick the best model from that
                     all_models = parse_fasc_all_models(
                         fasc_path=fasc_path,
                         pdb_glob=str(project_dir / "complex_input_full_*.pdb")
                     )
-                    # Convert Path objects to strings for JSON
-                    for model in all_models:
-                        if model.get("pdb_path"):
-                            model["pdb_path"] = str(model["pdb_path"])
-                    yield f"data: {json.dumps({'type': 'complete', 'bestScore': best['score'], 'bestModel': best['desc'], 'pdbPath': str(best['pdb_path']), 'index': best['index'], 'allModels': all_models})}\n\n"
+                    best = parse_fasc_and_find_best(models=all_models)
+                    yield _sse({'type': 'complete', 'bestScore': best['score'], 'bestModel': best['desc'], 'pdbPath': str(best['pdb_path']), 'index': best['index'], 'allModels': all_models})
                 except Exception as e:
-                    yield f"data: {json.dumps({'type': 'error', 'message': f'Failed to parse results: {str(e)}'})}\n\n"
+                    yield _sse({'type': 'error', 'message': f'Failed to parse results: {str(e)}'})
             else:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Docking failed - no results file generated'})}\n\n"
+                yield _sse({'type': 'error', 'message': 'Docking failed - no results file generated'})
                 
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield _sse({'type': 'error', 'message': str(e)})
         finally:
-            if project in active_docking_jobs:
+            for task in tasks:
+                task.cancel()
+            if active_docking_jobs.get(project) is job:
                 del active_docking_jobs[project]
+            if not run_finished and job.processes:
+                # The client went away, the run was cancelled or it failed: Rosetta
+                # runs in its own session, so stop it and tidy up its shards here
+                shard_fascs = [shard_fasc for _, shard_fasc in shards] if sharded else []
+                stop_task = asyncio.create_task(stop_docking_run(job.processes, shard_fascs, fasc_path))
+                stopping_docking_runs.add(stop_task)
+                stop_task.add_done_callback(stopping_docking_runs.discard)
     
-    return StreamingResponse(
+    # sep="\n" keeps the "data: ...\n\n" framing the frontend parser expects;
+    # the periodic ping stops proxies from dropping long Rosetta runs.
+    return EventSourceResponse(
         generate_progress(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        }
+        ping=15,
+        sep="\n",
+        headers={"X-Accel-Buffering": "no"},
     )
 
 
 @app.post("/dock-cancel")
-async def api_dock_cancel(project: str = Form(...)):
+async def api_dock_cancel(background_tasks: BackgroundTasks, project: str = Form(...)):
     """Cancel a running docking job."""
-    if project in active_docking_jobs:
-        process = active_docking_jobs[project]
-        process.terminate()
-        del active_docking_jobs[project]
+    job = active_docking_jobs.pop(project, None)
+    if job is not None:
+        job.cancel_event.set()
+        for process in job.processes:
+            signal_process_group(process, signal.SIGTERM)
+        background_tasks.add_task(kill_after_grace_period, job.processes)
         return {"status": "cancelled", "project": project}
     return {"status": "not_found", "project": project}
 
@@ -325,9 +530,31 @@ async def api_visualize(project: str = Form(...), pdb: str = Form(None)):
 
 
 # --------------- DOWNLOAD ----------------
+# Larger reads for multi-MB PDB ensembles and docking logs (Starlette defaults to 64 KiB)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+
+@functools.lru_cache(maxsize=256)
+def is_download_allowed(path: str) -> bool:
+    """Only files inside WORKDIR (after resolving symlinks and '..') may be downloaded."""
+    return Path(path).resolve().is_relative_to(WORKDIR_RESOLVED)
+
+
 @app.get("/download")
 async def api_download(path: str):
-    return FileResponse(path)
+    if not is_download_allowed(path):
+        raise HTTPException(status_code=403, detail="Path is outside the working directory.")
+    if not Path(path).is_file():
+        raise HTTPException(status_code=404, detail="File not found.")
+
+    # A filename makes this an attachment so browsers don't try to render huge logs inline
+    response = FileResponse(path, filename=Path(path).name, media_type="application/octet-stream")
+    response.chunk_size = DOWNLOAD_CHUNK_SIZE
+    return response
+
+
+# Parsed /dock-results payloads per project, keyed by the docking.fasc mtime they were built from
+dock_results_cache: dict[str, tuple[int, dict]] = {}
 
 
 @app.get("/dock-results")
@@ -340,23 +567,21 @@ async def api_dock_results(project: str):
     
     if not fasc_path.exists():
         raise HTTPException(status_code=404, detail="Docking results not found. Run docking first.")
+
+    mtime = fasc_path.stat().st_mtime_ns
+    cached = dock_results_cache.get(project)
+    if cached and cached[0] == mtime:
+        return cached[1]
     
     try:
+        # Parse the scorefile once and pick the best model from that
         all_models = parse_fasc_all_models(
             fasc_path=fasc_path,
             pdb_glob=str(project_dir / "complex_input_full_*.pdb")
         )
-        # Convert Path objects to strings for JSON
-        for model in all_models:
-            if model.get("pdb_path"):
-                model["pdb_path"] = str(model["pdb_path"])
-        
-        best = parse_fasc_and_find_best(
-            fasc_path=fasc_path,
-            pdb_glob=str(project_dir / "complex_input_full_*.pdb")
-        )
+        best = parse_fasc_and_find_best(models=all_models)
         
-        return {
+        results = {
             "allModels": all_models,
             "best": {
                 "score": best["score"],
@@ -368,3 +593,6 @@ async def api_dock_results(project: str):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse results: {str(e)}")
+
+    dock_results_cache[project] = (mtime, results)
+    return results
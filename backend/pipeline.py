@@ -6,6 +6,7 @@ Pure backend API for the Rosetta docking pipeline.
 
 This module exposes functions that your FastAPI backend can call:
 - fetch_pdb
+- close_http_client
 - copy_uploaded_pdb
 - write_fasta
 - run_colabfold
@@ -14,21 +15,29 @@ This module exposes functions that your FastAPI backend can call:
 - sanitize_pdb
 - combine_in_python
 - parse_fasc_and_find_best
+- find_best_k_models
+- load_docking_templates
+- install_docking_xml
+- write_docking_shards
+- merge_sharded_fasc
+- remove_shard_outputs
 - visualize_best_model
 - open_best_model_in_pymol
 """
 
+import functools
+import mmap
 import os
+import random
 import shutil
 import subprocess
 import tempfile
 from pathlib import Path
 import re
-import glob
 
-import requests
+import aiofiles
+import httpx
 import numpy as np
-from Bio.PDB import PDBParser, PDBIO
 
 # ============================================================
 # CONFIG
@@ -50,12 +59,73 @@ ROSETTA_SCRIPTS = (
 DOCKING_XML_SRC = Path("/home/gowrishr74/docking_new/docking_full.xml")
 DOCKING_OPTIONS_SRC = Path("/home/gowrishr74/docking_new/docking.options.txt")
 
+# Option lines rewritten per run in the docking options file
+OPTIONS_INPUT_RE = re.compile(r"^[ \t]*-s .*$", re.MULTILINE)
+OPTIONS_SCOREFILE_RE = re.compile(r"^[ \t]*-out:file:scorefile.*$", re.MULTILINE)
+
+
+def load_docking_templates() -> tuple[str, str]:
+    """
+    Return the docking XML protocol and options template.
+
+    Both files are read once and cached; they are only re-read when either
+    source file's mtime changes. The options text comes back as a str.format
+    template with {complex_pdb}, {fasc_path} and {nstruct} placeholders for
+    the per-run values.
+
+    Returns:
+        (xml_text, options_template)
+    """
+    return _read_docking_templates(
+        DOCKING_XML_SRC.stat().st_mtime_ns,
+        DOCKING_OPTIONS_SRC.stat().st_mtime_ns,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _read_docking_templates(xml_mtime: int, options_mtime: int) -> tuple[str, str]:
+    text = DOCKING_OPTIONS_SRC.read_text().replace("{", "{{").replace("}", "}}")
+    text = OPTIONS_INPUT_RE.sub("-s {complex_pdb}", text)
+    text = OPTIONS_SCOREFILE_RE.sub("-out:file:scorefile {fasc_path}", text)
+    options_template = text.removesuffix("\n") + "\n-nstruct {nstruct}"
+    return DOCKING_XML_SRC.read_text(), options_template
+
+
+def install_docking_xml(xml_path: Path) -> None:
+    """
+    Write the docking XML protocol to xml_path.
+
+    The copy is stamped with the source's mtime, so later runs in the same
+    project skip the write while the source is unchanged.
+    """
+    src_mtime = DOCKING_XML_SRC.stat().st_mtime_ns
+    try:
+        if xml_path.stat().st_mtime_ns == src_mtime:
+            return
+    except FileNotFoundError:
+        pass
+    xml_path.write_text(load_docking_templates()[0])
+    os.utime(xml_path, ns=(src_mtime, src_mtime))
+
+
 # Default working base (can be overridden by env or by passing explicit paths)
 DEFAULT_WORKDIR = Path(os.environ.get("PROTEINWEB_WORKDIR", "/home/gowrishr74/app_test"))
 
 # Surface gap for merging
 SURFACE_GAP = 2.0  # Å separation
 
+# Model descriptions: numeric suffix of 'complex_input_full_0003', and the
+# per-shard names ('complex_input_full_s2_0003') written by split docking runs
+MODEL_INDEX_RE = re.compile(r"_(\d+)$")
+SHARD_DESC_RE = re.compile(r"(.*)_s(\d+)_(\d+)$")
+# Per-shard scorefiles and options files of a split run
+SHARD_FILE_RE = re.compile(r"docking_s\d+\.(?:fasc|options\.txt)$")
+
+# SCORE rows inside a Rosetta log, matched over the raw bytes. No ^ anchor:
+# a literal prefix lets the regex engine scan ahead quickly, so callers check
+# for the line start themselves.
+LOG_SCORE_LINE_RE = re.compile(rb"SCORE:[^\n]*")
+
 # Default locations for docking outputs (used by parse_fasc_and_find_best / visualize_best_model)
 FASC_PATH = DEFAULT_WORKDIR / "docking.fasc"
 PDB_GLOB = str(DEFAULT_WORKDIR / "complex_input_full_*.pdb")
@@ -69,12 +139,59 @@ def extract_index(desc: str) -> int | None:
     """
     Extract numeric suffix like 0003 from 'complex_input_full_0003'.
     """
-    m = re.search(r"_(\d+)$", desc)
+    m = MODEL_INDEX_RE.search(desc)
     return int(m.group(1)) if m else None
 
 
+def merged_model_desc(desc: str, n_shards: int) -> str:
+    """
+    Name a split run's model gets once its shards are merged: model n of
+    shard k ('complex_input_full_s<k>_<n>') becomes number (n - 1) * n_shards
+    + k + 1. Shards deal nstruct out round-robin, so the numbers run 1..nstruct.
+    Other names are returned unchanged.
+    """
+    m = SHARD_DESC_RE.match(desc)
+    if not m:
+        return desc
+    index = (int(m.group(3)) - 1) * n_shards + int(m.group(2)) + 1
+    return f"{m.group(1)}_{index:04d}"
+
+
+def index_model_pdbs(pdb_glob: str) -> dict[int, Path]:
+    """
+    Map model index -> PDB path for files matching pdb_glob
+    (e.g. ".../complex_input_full_*.pdb").
+
+    Only the file name may contain the wildcard. The directory is read with a
+    single os.scandir pass and names are matched on prefix/suffix, which
+    avoids glob's per-entry fnmatch.
+    """
+    pattern = Path(pdb_glob)
+    prefix, _, suffix = pattern.name.partition("*")
+    pdb_map: dict[int, Path] = {}
+    try:
+        with os.scandir(pattern.parent) as it:
+            for entry in it:
+                name = entry.name
+                if not (name.startswith(prefix) and name.endswith(suffix)):
+                    continue
+                stem = name[: len(name) - len(suffix)]
+                # Models of a split run ('..._s2_0003') still waiting to be merged
+                # would otherwise shadow the merged model with the same number
+                if SHARD_DESC_RE.match(stem):
+                    continue
+                idx = extract_index(stem)
+                # Same tie-break as iterating sorted names: the last one wins
+                if idx is not None and (idx not in pdb_map or name > pdb_map[idx].name):
+                    pdb_map[idx] = Path(entry.path)
+    except FileNotFoundError:
+        pass
+    return pdb_map
+
+
 def parse_fasc_all_models(
-    fasc_path: Path | None = None, pdb_glob: str | None = None
+    fasc_path: Path | None = None,
+    pdb_glob: str | None = None,
 ) -> list[dict]:
     """
     Parse a Rosetta .fasc file and return ALL models with detailed scores.
@@ -123,12 +240,7 @@ def parse_fasc_all_models(
     models: list[dict] = []
     
     # Find all PDB files upfront for matching
-    candidates = sorted(glob.glob(pdb_glob))
-    pdb_map: dict[int, Path] = {}
-    for c in candidates:
-        idx = extract_index(Path(c).stem)
-        if idx is not None:
-            pdb_map[idx] = Path(c)
+    pdb_map = index_model_pdbs(pdb_glob)
 
     # Parse data lines (skip header and SEQUENCE lines)
     for line in lines[header_idx + 1:]:
@@ -180,10 +292,14 @@ def parse_fasc_all_models(
 
 
 def parse_fasc_and_find_best(
-    fasc_path: Path | None = None, pdb_glob: str | None = None
+    fasc_path: Path | None = None,
+    pdb_glob: str | None = None,
+    models: list[dict] | None = None,
 ) -> dict:
     """
     Parse a Rosetta .fasc file and return the best-scoring model.
+    Callers that already hold the parse_fasc_all_models output can pass it as
+    models to skip re-reading the scorefile.
 
     Returns a dict:
         {
@@ -193,10 +309,11 @@ def parse_fasc_and_find_best(
           "pdb_path": Path
         }
     """
-    all_models = parse_fasc_all_models(fasc_path, pdb_glob)
+    if models is None:
+        models = parse_fasc_all_models(fasc_path, pdb_glob)
     
-    # Find best (lowest score)
-    best = min(all_models, key=lambda x: x["score"])
+    # Find best (lowest score); copy so the caller's list keeps str paths
+    best = dict(min(models, key=lambda x: x["score"]))
     
     # Ensure pdb_path is Path object for backward compatibility
     if best.get("pdb_path"):
@@ -303,18 +420,46 @@ png {img_path}, dpi=300
 # INPUT / STRUCTURE HELPERS
 # ============================================================
 
-def fetch_pdb(pdb_code: str, output_dir: Path) -> Path:
+# Shared RCSB client so repeated fetches reuse the same TLS connection. Created
+# on first fetch, so importing this module for the docking helpers alone needs
+# neither h2 nor an open client.
+_http: httpx.AsyncClient | None = None
+
+
+def _http_client() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=16),
+        )
+    return _http
+
+
+async def close_http_client() -> None:
+    """Close the shared RCSB client, if one was opened (call on app shutdown)."""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+async def fetch_pdb(pdb_code: str, output_dir: Path) -> Path:
     """
     Download a PDB file from RCSB and save to output_dir.
+    Streams the body to disk so large entries never sit fully in memory.
     """
     pdb_code = pdb_code.lower().strip()
     url = f"https://files.rcsb.org/download/{pdb_code}.pdb"  # fixed spaces
-    r = requests.get(url)
-    r.raise_for_status()
 
     output_dir.mkdir(exist_ok=True, parents=True)
     out = output_dir / f"{pdb_code}.pdb"
-    out.write_bytes(r.content)
+    async with _http_client().stream("GET", url) as r:
+        r.raise_for_status()
+        async with aiofiles.open(out, "wb") as f:
+            async for chunk in r.aiter_bytes(1 << 16):
+                await f.write(chunk)
 
     print(f"📥 Fetched {pdb_code} → {out}")
     return out
@@ -333,7 +478,8 @@ def write_fasta(sequence: str, output_dir: Path, name: str) -> Path:
 def run_colabfold(fasta_path: Path, output_dir: Path) -> Path:
     """
     Run ColabFold and return the first produced PDB path.
-    Activates the 'colabfold' conda environment before running.
+    Runs colabfold_batch straight from the 'colabfold' conda environment,
+    with the PATH/CONDA_PREFIX that `conda activate` would have set.
     Logs are saved to output_dir/colabfold.log
     """
     output_dir.mkdir(exist_ok=True, parents=True)
@@ -341,49 +487,49 @@ def run_colabfold(fasta_path: Path, output_dir: Path) -> Path:
     # Path to conda
     CONDA_PATH = "/home/gowrishr74/anaconda3"
     CONDA_ENV = "colabfold"
+    conda_prefix = f"{CONDA_PATH}/envs/{CONDA_ENV}"
     
     # Log file path
     log_path = output_dir / "colabfold.log"
     
-    # Build command that activates conda env and runs colabfold
-    # Using bash -c to properly source conda and activate environment
-    activate_cmd = f"""
-source {CONDA_PATH}/etc/profile.d/conda.sh
-conda activate {CONDA_ENV}
-colabfold_batch "{fasta_path}" "{output_dir}" --use-gpu-relax
-"""
+    # Exec the env's binary directly: no shell, no quoting of user paths
+    cmd = [
+        f"{conda_prefix}/bin/colabfold_batch",
+        str(fasta_path),
+        str(output_dir),
+        "--use-gpu-relax",
+    ]
+    env = os.environ.copy()
+    env["PATH"] = f"{conda_prefix}/bin" + os.pathsep + env.get("PATH", "")
+    env["CONDA_PREFIX"] = conda_prefix
+    env["CONDA_DEFAULT_ENV"] = CONDA_ENV
     
     print(f"🧬 Running ColabFold prediction...")
     print(f"   Input: {fasta_path}")
     print(f"   Output: {output_dir}")
     print(f"   Log: {log_path}")
     
-    # Run with output to both console and log file
     with open(log_path, "w") as log_file:
         log_file.write(f"=== ColabFold Prediction ===\n")
         log_file.write(f"Input FASTA: {fasta_path}\n")
         log_file.write(f"Output Dir: {output_dir}\n")
         log_file.write(f"Conda Env: {CONDA_ENV}\n")
         log_file.write(f"=" * 40 + "\n\n")
-        
-        process = subprocess.Popen(
-            ["bash", "-c", activate_cmd],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1
-        )
-        
-        # Stream output to both console and log file
-        for line in iter(process.stdout.readline, ''):
-            if not line:
-                break
-            print(line, end='')  # Print to console
-            log_file.write(line)  # Write to log file
-            log_file.flush()
-        
-        process.wait()
-        
+
+    # Send output to both console and log file through tee, so the lines
+    # never pass through Python
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+    )
+    tee = subprocess.Popen(["tee", "-a", str(log_path)], stdin=process.stdout)
+    process.stdout.close()  # tee holds the only read end now
+    process.wait()
+    tee.wait()
+
+    with open(log_path, "a") as log_file:
         if process.returncode != 0:
             error_msg = f"ColabFold failed with exit code {process.returncode}"
             log_file.write(f"\n\nERROR: {error_msg}\n")
@@ -425,12 +571,30 @@ def copy_uploaded_pdb(path: str, output_dir: Path) -> Path:
 def detect_first_chain(pdb_path: Path) -> str:
     """
     Detect the first chain ID in a PDB file.
+
+    The file is memory-mapped and searched for the first ATOM/HETATM record,
+    so only the pages up to that record are read, not every line in Python.
     """
-    with open(pdb_path) as fh:
-        for line in fh:
-            if line.startswith(("ATOM", "HETATM")):
-                return line[21].strip() or "A"
-    return "A"
+    with open(pdb_path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return "A"
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:4] == b"ATOM" or mm[:6] == b"HETATM":
+                start = 0
+            else:
+                start = mm.find(b"\nATOM")
+                # A HETATM record only wins if it comes before the first ATOM
+                het = mm.find(b"\nHETATM", 0, start if start >= 0 else len(mm))
+                if het >= 0:
+                    start = het
+                if start < 0:
+                    return "A"
+                start += 1
+            end = mm.find(b"\n", start)
+            line = mm[start:end if end >= 0 else len(mm)]
+    if len(line) <= 21:
+        return "A"
+    return chr(line[21]).strip() or "A"
 
 
 def run_clean_pdb(input_path: Path, output_path: Path) -> None:
@@ -468,6 +632,25 @@ def run_clean_pdb(input_path: Path, output_path: Path) -> None:
 # CHAIN NORMALIZER
 # ============================================================
 
+def atom_record_starts(buf: np.ndarray, min_length: int) -> np.ndarray:
+    """
+    Byte offsets of the ATOM/HETATM lines in a PDB file loaded as a uint8 array.
+
+    Only lines with at least min_length bytes (newline excluded) are returned,
+    so callers can index fixed columns without bounds checks.
+    """
+    newlines = np.flatnonzero(buf == ord("\n"))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.append(newlines, buf.size)
+    starts = starts[ends - starts >= max(min_length, 6)]
+
+    record = buf[starts[:, None] + np.arange(6)]
+    is_atom = (record[:, :4] == np.frombuffer(b"ATOM", np.uint8)).all(axis=1) | (
+        record == np.frombuffer(b"HETATM", np.uint8)
+    ).all(axis=1)
+    return starts[is_atom]
+
+
 def normalize_chains(pdb_path: Path, used: set | None = None) -> tuple[Path, set]:
     """
     Ensure unique chain IDs for all models.
@@ -481,30 +664,36 @@ def normalize_chains(pdb_path: Path, used: set | None = None) -> tuple[Path, set
     fixed = pdb_path.with_name(pdb_path.stem + "_chains.pdb")
     letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
-    new_lines: list[str] = []
+    # Work on the raw bytes: the chain ID is column 22 (offset 21) of every
+    # ATOM/HETATM line and can be rewritten in place
+    buf = np.frombuffer(pdb_path.read_bytes(), dtype=np.uint8).copy()
+    chain_pos = atom_record_starts(buf, 22) + 21
+    old_chains = buf[chain_pos]
+
+    # Distinct chain IDs in the order they first appear
+    uniq, first_seen = np.unique(old_chains, return_index=True)
+
     chain_map: dict[str, str] = {}
+    remap = np.arange(256, dtype=np.uint8)
     next_idx = len(used)
 
-    with open(pdb_path) as fh:
-        for line in fh:
-            if line.startswith(("ATOM", "HETATM")):
-                old = line[21]
-                if old.strip() == "":
-                    old = "_"
-
-                if old not in chain_map:
-                    while letters[next_idx] in used:
-                        next_idx += 1
-                    new_chain = letters[next_idx]
-                    chain_map[old] = new_chain
-                    used.add(new_chain)
-                    next_idx += 1
-
-                new_lines.append(line[:21] + chain_map[old] + line[22:])
-            else:
-                new_lines.append(line)
+    for code in uniq[np.argsort(first_seen)]:
+        old = chr(code)
+        if old.strip() == "":
+            old = "_"
+
+        if old not in chain_map:
+            while letters[next_idx] in used:
+                next_idx += 1
+            new_chain = letters[next_idx]
+            chain_map[old] = new_chain
+            used.add(new_chain)
+            next_idx += 1
+
+        remap[code] = ord(chain_map[old])
 
-    fixed.write_text("".join(new_lines))
+    buf[chain_pos] = remap[old_chains]
+    fixed.write_bytes(buf.tobytes())
     return fixed, used
 
 
@@ -517,29 +706,24 @@ def sanitize_pdb(pdb_path: Path) -> Path:
     Renumber residues sequentially, ignoring insertion codes.
     """
     fixed = pdb_path.with_name(pdb_path.stem + "_fixed.pdb")
-    new_lines: list[str] = []
-    last_key = None
-    new_resseq = 1
-    new_num = "   1"
-
-    with open(pdb_path) as fh:
-        for line in fh:
-            if line.startswith(("ATOM", "HETATM")):
-                chain = line[21]
-                resseq = line[22:26].strip()
-                icode = line[26].strip()
-                key = (chain, resseq, icode)
-
-                if key != last_key:
-                    new_num = f"{new_resseq:4d}"
-                    new_resseq += 1
-                    last_key = key
-
-                new_lines.append(line[:22] + new_num + " " + line[27:])
-            else:
-                new_lines.append(line)
 
-    fixed.write_text("".join(new_lines))
+    # Work on the raw bytes: chain, resSeq and iCode are columns 22-27
+    # (offsets 21-26) of every ATOM/HETATM line and are rewritten in place
+    buf = np.frombuffer(pdb_path.read_bytes(), dtype=np.uint8).copy()
+    starts = atom_record_starts(buf, 27)
+    residue_cols = buf[starts[:, None] + np.arange(21, 27)]
+
+    # A new residue starts wherever (chain, resSeq, iCode) differs from the previous atom
+    new_residue = np.ones(len(starts), dtype=bool)
+    new_residue[1:] = (residue_cols[1:] != residue_cols[:-1]).any(axis=1)
+    new_resseq = np.cumsum(new_residue)
+
+    # resSeq is four columns wide, so numbering wraps after 9999
+    digits = np.char.mod("%4d", new_resseq % 10000).astype("S4")
+    buf[starts[:, None] + np.arange(22, 26)] = digits.view(np.uint8).reshape(-1, 4)
+    buf[starts + 26] = ord(" ")
+
+    fixed.write_bytes(buf.tobytes())
     return fixed
 
 
@@ -547,83 +731,189 @@ def sanitize_pdb(pdb_path: Path) -> Path:
 # ALIGN + MERGE
 # ============================================================
 
+def structure_coords(struct) -> np.ndarray:
+    """
+    Return the coordinates of every atom in a Biopython structure or model as
+    one contiguous (N, 3) float32 array, filled straight from the atom iterator.
+    """
+    return np.fromiter(
+        (a.coord for a in struct.get_atoms()), dtype=np.dtype((np.float32, 3))
+    ).reshape(-1, 3)
+
+
 def load_coords(pdb_path: Path):
+    from Bio.PDB import PDBParser
+
     parser = PDBParser(QUIET=True)
     struct = parser.get_structure("s", pdb_path)
-    coords = np.array([a.coord for a in struct.get_atoms()])
+    coords = structure_coords(struct)
     return coords, struct
 
 
 def translate_structure(struct, vec):
-    for atom in struct.get_atoms():
-        atom.coord = atom.coord + vec
+    # One vectorised add; the loop only writes the shifted rows back
+    shifted = structure_coords(struct) + np.asarray(vec, dtype=np.float32)
+    for atom, coord in zip(struct.get_atoms(), shifted):
+        atom.coord = coord
 
 
 def save_pdb(struct, path: Path):
+    from Bio.PDB import PDBIO
+
     io = PDBIO()
     io.set_structure(struct)
     io.save(str(path))
 
 
-def combine_in_python(rec: Path, bin: Path, out: Path, gap: float = SURFACE_GAP) -> None:
-    """
-    Align binder to receptor such that the closest atoms are at a given gap distance,
-    then write out a merged complex PDB.
+def binder_shift(rec_coords: np.ndarray, bin_coords: np.ndarray, gap: float) -> np.ndarray:
     """
-    parser = PDBParser(QUIET=True)
-
-    rec_struct = parser.get_structure("rec", rec)
-    bin_struct = parser.get_structure("bin", bin)
+    Return the translation that leaves the closest receptor/binder atom pair
+    exactly gap apart, as float32 like the coordinates it is added to.
 
-    # Force chain IDs
-    for atom in rec_struct.get_atoms():
-        atom.get_parent().get_parent().id = "A"
-    for atom in bin_struct.get_atoms():
-        atom.get_parent().get_parent().id = "B"
-
-    # Coordinates BEFORE merge
-    rec_coords = np.array([a.coord for a in rec_struct.get_atoms()])
-    bin_coords = np.array([a.coord for a in bin_struct.get_atoms()])
-
-    # Find closest pair
-    dists = np.linalg.norm(rec_coords[:, None, :] - bin_coords[None, :, :], axis=2)
-    min_i, min_j = np.unravel_index(np.argmin(dists), dists.shape)
-    # min_dist = dists[min_i, min_j]  # unused but kept for clarity
+    Overlapping inputs (closest pair nearer than gap) are always pushed apart
+    along that pair. Earlier versions tried both directions and kept the one
+    whose new closest distance was nearer gap, which for such inputs was
+    sometimes the other direction, so their merged complexes differ.
+    """
+    from scipy.spatial import cKDTree
+
+    # Find closest pair: nearest receptor atom for every binder atom via a KD-tree,
+    # instead of materialising the full N x M distance matrix. The tree compares
+    # squared distances internally and only takes one sqrt per binder atom, for
+    # the distances it returns. One query is answered per tree, so build it the
+    # cheap way (sliding-midpoint splits, no node shrinking); the result is the
+    # same exact nearest neighbour
+    tree = cKDTree(rec_coords, balanced_tree=False, compact_nodes=False)
+    nearest_dists, nearest_rec = tree.query(bin_coords, k=1, workers=-1)
+    min_j = int(np.argmin(nearest_dists))
+    min_i = int(nearest_rec[min_j])
 
     # Vector binder → receptor
     vec = rec_coords[min_i] - bin_coords[min_j]
     norm = np.linalg.norm(vec)
     if norm < 1e-6:
-        vec = np.array([1.0, 0.0, 0.0])
-        norm = 1.0
+        vec = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+        norm = np.float32(1.0)
 
     unit = vec / norm
 
-    # Required movement to reach final distance = gap
-    needed = norm - gap
+    # Required movement to reach final distance = gap. vec points from the binder
+    # atom to the receptor atom, so moving the binder by unit * needed leaves that
+    # pair exactly gap apart (needed < 0 pushes overlapping inputs apart).
+    needed = norm - np.float32(gap)
+    return (unit * needed).astype(np.float32, copy=False)
 
-    # Test BOTH possible directions
-    shift_forward = unit * (-needed)  # expected direction (toward)
-    shift_backward = unit * needed    # opposite direction
 
-    # Compute resulting closest distances
-    test1 = np.min(
-        np.linalg.norm((bin_coords + shift_forward)[:, None, :] - rec_coords[None, :, :], axis=2)
-    )
-    test2 = np.min(
-        np.linalg.norm((bin_coords + shift_backward)[:, None, :] - rec_coords[None, :, :], axis=2)
-    )
+def combine_in_python(rec: Path, bin: Path, out: Path, gap: float = SURFACE_GAP) -> None:
+    """
+    Align binder to receptor such that the closest atoms are at a given gap distance,
+    then write out a merged complex PDB.
+
+    Uses gemmi (C++ PDB reader/writer) when it is installed and falls back to
+    Biopython otherwise. Both paths follow the same rules, so the output does not
+    depend on which one ran: only the first model of each input is used, and
+    atom serials run on across TER records, as PDBIO writes them.
+    """
+    try:
+        import gemmi
+    except ImportError:
+        gemmi = None
+
+    # Write next to out and rename over it: run_docking may have hard-linked out
+    # to the caller's complex, and writing in place would change that file too
+    tmp_out = out.with_name(f".{out.name}.tmp")
+    try:
+        if gemmi is not None:
+            _combine_with_gemmi(gemmi, rec, bin, tmp_out, gap)
+        else:
+            _combine_with_biopython(rec, bin, tmp_out, gap)
+        os.replace(tmp_out, out)
+    finally:
+        tmp_out.unlink(missing_ok=True)
+
+    print(f"🤝 Complex saved → {out}")
 
-    # Choose the shift that gives distance closest to desired gap
-    final_shift = shift_forward if abs(test1 - gap) < abs(test2 - gap) else shift_backward
 
-    # Apply translation
-    for atom in bin_struct.get_atoms():
-        atom.coord += final_shift
+def _combine_with_gemmi(gemmi, rec: Path, bin: Path, out: Path, gap: float) -> None:
+    rec_struct = gemmi.read_structure(str(rec))
+    bin_struct = gemmi.read_structure(str(bin))
+    # First model only
+    del rec_struct[1:]
+    del bin_struct[1:]
+    rec_model = rec_struct[0]
+    bin_model = bin_struct[0]
+
+    # Force chain IDs
+    for chain in rec_model:
+        chain.name = "A"
+    for chain in bin_model:
+        chain.name = "B"
+
+    # Coordinates BEFORE merge, rounded to float32 like Biopython's so both
+    # paths compute the same shift
+    rec_coords = np.array([cra.atom.pos.tolist() for cra in rec_model.all()], dtype=np.float32)
+    bin_coords = np.array([cra.atom.pos.tolist() for cra in bin_model.all()], dtype=np.float32)
+    final_shift = binder_shift(rec_coords, bin_coords, gap)
+
+    # Apply translation to every binder atom in C++
+    bin_model.transform_pos_and_adp(
+        gemmi.Transform(gemmi.Mat33(), gemmi.Vec3(*final_shift.tolist()))
+    )
 
     # Merge
+    for chain in bin_model:
+        rec_model.add_chain(chain)
+
+    # Number atoms like PDBIO, where a TER record does not use up a serial
+    for serial, cra in enumerate(rec_model.all(), start=1):
+        cra.atom.serial = serial
+
+    # Save atoms, TER and END only, like PDBIO
+    rec_struct.setup_entities()
+    options = gemmi.PdbWriteOptions()
+    options.minimal_file = True
+    options.cryst1_record = False
+    options.ter_records = True
+    options.end_record = True
+    options.preserve_serial = True
+    rec_struct.write_pdb(str(out), options)
+
+
+def _combine_with_biopython(rec: Path, bin: Path, out: Path, gap: float) -> None:
+    # Biopython is only needed here; importing it lazily keeps worker start-up light
+    from Bio.PDB import PDBParser, PDBIO
+
+    # A fresh parser per call on purpose: PDBParser keeps per-parse state in its
+    # StructureBuilder, and /merge runs this in worker threads
+    parser = PDBParser(QUIET=True)
+
+    rec_struct = parser.get_structure("rec", rec)
+    bin_struct = parser.get_structure("bin", bin)
+
+    # First model only, like the gemmi path
+    for model in list(rec_struct)[1:]:
+        rec_struct.detach_child(model.id)
     rec_model = rec_struct[0]
-    for chain in bin_struct[0]:
+    bin_model = bin_struct[0]
+
+    # Force chain IDs (once per chain)
+    for chain in rec_model:
+        chain.id = "A"
+    for chain in bin_model:
+        chain.id = "B"
+
+    # Coordinates BEFORE merge
+    rec_coords = structure_coords(rec_model)
+    bin_coords = structure_coords(bin_model)
+    final_shift = binder_shift(rec_coords, bin_coords, gap)
+
+    # Apply translation: one vectorised add, then write the rows back
+    shifted = bin_coords + final_shift
+    for atom, coord in zip(bin_model.get_atoms(), shifted):
+        atom.coord = coord
+
+    # Merge
+    for chain in list(bin_model):
         rec_model.add(chain)
 
     # Save
@@ -631,19 +921,88 @@ def combine_in_python(rec: Path, bin: Path, out: Path, gap: float = SURFACE_GAP)
     io.set_structure(rec_struct)
     io.save(str(out))
 
-    print(f"🤝 Complex saved → {out}")
-
 
 # ============================================================
 # ROSETTA DOCKING
 # ============================================================
 
+def write_docking_shards(
+    complex_pdb: Path,
+    output_dir: Path,
+    nstruct: int,
+    workers: int | None = None,
+    rosetta_bin: str | None = None,
+) -> list[tuple[list[str], Path]]:
+    """
+    Prepare a docking run in output_dir and return each Rosetta process's
+    (command, scorefile).
+
+    Rosetta is single-threaded, so nstruct is split across up to workers
+    processes (defaults to the CPU count), each running rosetta_bin (defaults to
+    ROSETTA_SCRIPTS). A single process keeps the original
+    file names (docking.options.txt, docking.fasc, '_full' models) and needs
+    no merging. Process k of a split run gets docking_s<k>.options.txt,
+    docking_s<k>.fasc, '_full_s<k>' models and its own random stream; this is
+    the naming SHARD_DESC_RE, SHARD_FILE_RE and merged_model_desc parse.
+
+    docking.fasc and leftover shard files are removed first, so every run
+    starts a fresh scorefile, and the XML protocol is installed if stale.
+    """
+    xml_path = output_dir / "docking_full.xml"
+    fasc_path = output_dir / "docking.fasc"
+    n_shards = max(1, min(workers or os.cpu_count() or 1, nstruct))
+    sharded = n_shards > 1
+    seed = random.randrange(1, 1 << 30)
+
+    # Every run starts a fresh docking.fasc, split or not (Rosetta appends to an
+    # existing scorefile), and leftovers of an interrupted split run must not
+    # shadow this run's models
+    fasc_path.unlink(missing_ok=True)
+    remove_shard_outputs(output_dir)
+
+    install_docking_xml(xml_path)
+
+    # Options files are specialised from the per-process template, so the source
+    # options file is not copied, re-read or rewritten on every run
+    options_template = load_docking_templates()[1]
+    shards = []
+    for k in range(n_shards):
+        shard_nstruct = nstruct // n_shards + (1 if k < nstruct % n_shards else 0)
+        if sharded:
+            options_path = output_dir / f"docking_s{k}.options.txt"
+            shard_fasc = output_dir / f"docking_s{k}.fasc"
+            suffix = f"_full_s{k}"
+        else:
+            options_path = output_dir / "docking.options.txt"
+            shard_fasc = fasc_path
+            suffix = "_full"
+
+        options_path.write_text(options_template.format(
+            complex_pdb=complex_pdb, fasc_path=shard_fasc, nstruct=shard_nstruct
+        ))
+
+        # Build command exactly like the working script; nstruct is in the options file
+        cmd = [
+            rosetta_bin or ROSETTA_SCRIPTS,
+            f"@{options_path}",
+            "-parser:protocol", str(xml_path),
+            "-out:suffix", suffix,
+            "-overwrite"
+        ]
+        if sharded:
+            # Every shard gets its own scorefile, model suffix and random stream
+            cmd += ["-run:constant_seed", "-run:jran", str(seed + k)]
+        shards.append((cmd, shard_fasc))
+    return shards
+
+
 def run_docking(
     complex_pdb: Path,
     output_dir: Path | None = None,
     nstruct: int = 10,
     xml_content: str | None = None,
     options_extra: str = "",
+    workers: int | None = None,
 ) -> dict:
     """
     Run Rosetta docking protocol on a complex PDB.
@@ -654,6 +1013,7 @@ def run_docking(
         nstruct: Number of structures to generate
         xml_content: Custom XML protocol (uses default if None)
         options_extra: Additional command-line options
+        workers: Rosetta processes to split nstruct across (defaults to the CPU count)
     
     Returns:
         dict with keys: fasc_path, output_dir, nstruct
@@ -663,107 +1023,214 @@ def run_docking(
     
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Copy complex to output dir if not already there
+    # Put the complex in the output dir if it is not already there. Rosetta only
+    # reads it, so a hard link does instead of a copy when both are on one filesystem.
+    # Anything that later rewrites complex_input.pdb must replace the file rather
+    # than write into it, or the caller's file changes too (combine_in_python does).
     complex_dest = output_dir / "complex_input.pdb"
-    if complex_pdb != complex_dest:
-        shutil.copy(complex_pdb, complex_dest)
-    
-    # Copy working XML protocol
-    xml_path = output_dir / "docking_full.xml"
-    shutil.copy(DOCKING_XML_SRC, xml_path)
-    print(f"→ Copied docking_full.xml → {xml_path}")
-    
-    # Copy and update options file
-    options_path = output_dir / "docking.options.txt"
-    shutil.copy(DOCKING_OPTIONS_SRC, options_path)
-    
-    # Update -s line in options to point to our complex
-    opt_text = options_path.read_text().splitlines()
-    new_lines = []
-    for line in opt_text:
-        if line.strip().startswith("-s "):
-            new_lines.append(f"-s {complex_dest}")
-        else:
-            new_lines.append(line)
-    options_path.write_text("\n".join(new_lines))
-    print(f"→ Updated docking.options.txt with complex path")
+    if complex_pdb.resolve() != complex_dest.resolve():
+        complex_dest.unlink(missing_ok=True)
+        try:
+            os.link(complex_pdb, complex_dest)
+        except OSError:
+            shutil.copy(complex_pdb, complex_dest)
     
+    # Write the XML protocol and one options file per Rosetta process
+    shards = write_docking_shards(complex_dest, output_dir, nstruct, workers)
+    print(f"→ Installed docking_full.xml → {output_dir / 'docking_full.xml'}")
+
+    n_shards = len(shards)
+    sharded = n_shards > 1
+    fasc_path = output_dir / "docking.fasc"
+
     print(f"🚀 Starting Rosetta docking...")
     print(f"   Complex: {complex_dest}")
     print(f"   Output:  {output_dir}")
-    print(f"   nstruct: {nstruct}")
+    print(f"   nstruct: {nstruct} ({n_shards} process{'es' if sharded else ''})")
     
-    # Build command exactly like the working script
-    docking_cmd = [
-        ROSETTA_SCRIPTS,
-        f"@{options_path}",
-        "-parser:protocol", str(xml_path),
-        "-out:suffix", "_full",
-        "-nstruct", str(nstruct),
-        "-overwrite"
-    ]
-    
-    print(f"   Command: {' '.join(docking_cmd)}")
+    for cmd, _ in shards:
+        print(f"   Command: {' '.join(cmd)}")
     print("=" * 50)
     
-    # Run with log file
+    # Run with log file. Rosetta writes straight to the file descriptor; stderr
+    # shares stdout's so both streams land in one ordered log.
     log_path = output_dir / "docking_full.log"
-    with open(log_path, "w") as log:
-        result = subprocess.run(
-            docking_cmd,
-            cwd=output_dir,
-            stdout=log,
-            stderr=log
-        )
+    processes: list[subprocess.Popen] = []
+    try:
+        with open(log_path, "wb") as log:
+            for cmd, _ in shards:
+                processes.append(
+                    subprocess.Popen(cmd, cwd=output_dir, stdout=log, stderr=subprocess.STDOUT)
+                )
+            returncodes = [process.wait() for process in processes]
+    finally:
+        # If a shard failed to start or we were interrupted, stop the others
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        # Whether the run succeeded or not, fold what the shards finished into
+        # docking.fasc (like a single process leaves its partial scorefile) and
+        # delete the shard files
+        if sharded:
+            merge_sharded_fasc([shard_fasc for _, shard_fasc in shards], fasc_path)
+            remove_shard_outputs(output_dir)
     
-    if result.returncode != 0:
-        print(f"❌ Rosetta failed with code {result.returncode}")
+    failed = [code for code in returncodes if code != 0]
+    if failed:
+        print(f"❌ Rosetta failed with code {failed[0]}")
         print(f"   See log: {log_path}")
         raise RuntimeError(f"Rosetta docking failed. Check {log_path}")
     
     print(f"✅ Docking complete!")
-    print(f"   Results: {output_dir / 'docking.fasc'}")
+    print(f"   Results: {fasc_path}")
     
     return {
-        "fasc_path": str(output_dir / "docking.fasc"),
+        "fasc_path": str(fasc_path),
         "output_dir": str(output_dir),
         "nstruct": nstruct,
         "log_path": str(log_path),
     }
 
 
+def merge_sharded_fasc(shard_fascs: list[Path], fasc_path: Path) -> None:
+    """
+    Combine the scorefiles of a docking run split across several Rosetta
+    processes into a single fasc.
+
+    shard_fascs is indexed by shard. Shard k writes models named
+    '<name>_s<k>_<n>'; each is renamed (PDB file included) to
+    merged_model_desc's '<name>_<i>', the name streamed progress already
+    reported, and rows are written in that order so the merged results look
+    like those of a single process. Header lines are kept once and the shard
+    scorefiles are removed afterwards. fasc_path is overwritten, or left
+    untouched if the shards hold no models.
+    """
+    n_shards = len(shard_fascs)
+    header_lines: list[str] = []
+    rows: list[tuple[str, str]] = []
+
+    for shard_fasc in shard_fascs:
+        try:
+            fh = shard_fasc.open()
+        except FileNotFoundError:
+            continue
+
+        # Stream the shard line by line rather than holding a second copy of it
+        keep_header = not header_lines
+        with fh:
+            for line in fh:
+                if not line.startswith("SCORE:") or "total_score" in line:
+                    if keep_header:
+                        header_lines.append(line.rstrip("\r\n"))
+                    continue
+
+                line = line.rstrip()
+                desc = line.rsplit(None, 1)[-1]
+                new_desc = merged_model_desc(desc, n_shards)
+                if new_desc != desc:
+                    try:
+                        (fasc_path.parent / f"{desc}.pdb").replace(
+                            fasc_path.parent / f"{new_desc}.pdb"
+                        )
+                    except FileNotFoundError:
+                        pass
+                    line = line[: -len(desc)] + new_desc
+                rows.append((new_desc, line))
+
+        shard_fasc.unlink()
+
+    # No models at all (cancelled before the first one, or every shard died at
+    # start-up): leave fasc_path absent, as an unstarted run would
+    if not rows:
+        return
+
+    rows.sort(key=lambda row: extract_index(row[0]) or 0)
+    fasc_path.write_text("\n".join(header_lines + [line for _, line in rows]) + "\n")
+
+
+def remove_shard_outputs(output_dir: Path) -> None:
+    """
+    Delete what a split docking run leaves in output_dir before its merge:
+    shard scorefiles and options files (docking_s<k>.*) and unmerged model
+    PDBs ('<name>_s<k>_<n>.pdb').
+    """
+    with os.scandir(output_dir) as it:
+        for entry in it:
+            name = entry.name
+            if SHARD_FILE_RE.match(name) or (
+                name.endswith(".pdb") and SHARD_DESC_RE.match(name[:-4])
+            ):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
 # ============================================================
 # OPTIONAL: BEST MODEL FROM LOG (ALTERNATIVE PATH)
 # ============================================================
 
-def find_best_model_in_folder(folder: Path) -> Path:
+def find_best_k_models(folder: Path, k: int = 1) -> list[dict]:
     """
-    Finds lowest-score model name from docking/docking_full.log,
-    then resolves actual .pdb path (either working folder or cwd).
+    Return the k lowest-score models in docking/docking_full.log, best first:
+
+        [{"score": float (total_score), "desc": str (model name)}, ...]
+
+    Equal scores keep log order, so k=1 gives the first best row.
     """
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+
     log_path = folder / "docking" / "docking_full.log"
     if not log_path.exists():
         raise FileNotFoundError("docking_full.log not found inside /docking/")
 
-    best_score = float("inf")
-    best_model: str | None = None
-
-    with open(log_path) as f:
-        for line in f:
-            if line.startswith("SCORE:"):
-                parts = line.split()
+    score_list: list[float] = []
+    descs: list[bytes] = []
+
+    # Let the regex engine skip the (many) non-SCORE log lines over a memory
+    # map; only SCORE rows become Python objects
+    with open(log_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise RuntimeError("No valid SCORE lines found.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for match in LOG_SCORE_LINE_RE.finditer(mm):
+                if match.start() and mm[match.start() - 1] != ord("\n"):
+                    continue  # "SCORE:" in the middle of a line
+                parts = match.group().split()
                 try:
                     score = float(parts[1])
-                    model = parts[-1]  # example: complex_input_full_0003
-                    if score < best_score:
-                        best_score = score
-                        best_model = model
-                except Exception:
+                except (IndexError, ValueError):
                     continue
+                if score != score:
+                    continue  # nan never ranks
+                score_list.append(score)
+                descs.append(parts[-1])  # example: complex_input_full_0003
 
-    if not best_model:
+    if not score_list:
         raise RuntimeError("No valid SCORE lines found.")
 
+    # Select in O(N) with a partition rather than sorting every score; only the
+    # k winners are sorted. Ties on the k-th score are broken by log order.
+    scores = np.asarray(score_list)
+    k = min(k, scores.size)
+    kth = np.partition(scores, k - 1)[k - 1]
+    below = np.flatnonzero(scores < kth)
+    ties = np.flatnonzero(scores == kth)[: k - below.size]
+    idx = np.concatenate((below, ties))
+    idx = idx[np.lexsort((idx, scores[idx]))]
+
+    return [{"score": float(scores[i]), "desc": descs[i].decode()} for i in idx]
+
+
+def find_best_model_in_folder(folder: Path) -> Path:
+    """
+    Finds lowest-score model name from docking/docking_full.log,
+    then resolves actual .pdb path (either working folder or cwd).
+    """
+    best_model = find_best_k_models(folder, k=1)[0]["desc"]
+
     candidate = folder / f"{best_model}.pdb"
     if candidate.exists():
         return candidate
@@ -199,6 +199,13 @@ export async function dockWithProgress(
               case 'score':
                 callbacks.onScore?.(data);
                 break;
+              case 'batch':
+                // Coalesced updates: latest progress plus every score since the last event
+                if (data.progress) callbacks.onProgress?.(data.progress);
+                for (const score of data.scores ?? []) {
+                  callbacks.onScore?.(score);
+                }
+                break;
               case 'complete':
                 callbacks.onComplete?.(data);
                 break;